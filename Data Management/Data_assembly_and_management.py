@@ -1,10 +1,11 @@
 
 import streamlit as st
-import importlib
+import ast
+import html
 import os
 import sys
+import traceback
 import types
-import importlib.util
 from datetime import datetime
 
 # Set page configuration for the main dashboard
@@ -15,6 +16,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# st.fragment is only available in newer Streamlit releases; fall back to a plain call
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Directory holding this dashboard and its module files
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
 # Define color theme - light blue palette
 COLORS = {
     "primary": "#1E88E5",       # Primary blue
@@ -24,7 +31,42 @@ COLORS = {
     "accent": "#64B5F6"         # Accent blue
 }
 
+# Define the modules with their descriptions and icons
+MODULES = {
+    "Combine_files.py": {"icon": "", "desc": "Merge multiple datasets into unified data structure"},
+    "Rename_columns.py": {"icon": "", "desc": "Standardize and rename data columns for consistency"},
+    "Create_new_variables.py": {"icon": "", "desc": "Generate derived variables and calculated fields"},
+    "Outlier_detection_and_correction.py": {"icon": "", "desc": "Identify and handle data anomalies and outliers"}
+}
+
+# Functions tried, in order, to start a module after it has been loaded
+ENTRYPOINTS = ('run', 'main')
+
+# Display names and card HTML for each module, built once at import
+MODULE_CARDS = {}
+for _name, _info in MODULES.items():
+    _display = _name[:-3].replace('_', ' ').title()
+    MODULE_CARDS[_name] = {
+        'display': _display,
+        # Kept on one line: a blank line or 4-space indent inside the grid
+        # would end the HTML block and render the rest as a code block
+        'card_html': (
+            f'<div class="module-card">'
+            f'<h3><span class="module-icon">{_info["icon"]}</span>{_display}</h3>'
+            f'<p>{_info["desc"]}</p>'
+            f'</div>'
+        )
+    }
+
+# All module cards laid out in a two-column grid, emitted as one block
+MODULE_GRID_HTML = (
+    '<div style="display:grid;grid-template-columns:1fr 1fr;gap:15px">'
+    + ''.join(card['card_html'] for card in MODULE_CARDS.values())
+    + '</div>'
+)
+
 # CSS for styling the dashboard
+@st.cache_data
 def get_css():
     return f"""
     <style>
@@ -95,6 +137,16 @@ def get_css():
             margin-bottom: 20px;
         }}
         
+        /* Error messages */
+        .error-box {{
+            background-color: #FFEBEE;
+            border-left: 5px solid #E53935;
+            border-radius: 5px;
+            color: #B71C1C;
+            padding: 10px 15px;
+            margin-bottom: 15px;
+        }}
+        
         /* Dividers */
         hr {{
             border-top: 2px solid {COLORS["secondary"]};
@@ -119,47 +171,66 @@ def get_css():
     </style>
     """
 
+# Greeting for each hour of the day
+_GREETINGS = ("Good Morning",) * 12 + ("Good Afternoon",) * 6 + ("Good Evening",) * 6
+
 # Generate a greeting based on time of day
 def get_greeting():
-    current_hour = datetime.now().hour
-    if current_hour < 12:
-        return "Good Morning"
-    elif current_hour < 18:
-        return "Good Afternoon"
-    else:
-        return "Good Evening"
+    return _GREETINGS[datetime.now().hour]
+
+# Current date for the header, refreshed at most once a minute
+@st.cache_data(ttl=60)
+def _date_string():
+    return datetime.now().strftime("%A, %B %d, %Y")
+
+# Header HTML, rebuilt only when the greeting or date changes
+@st.cache_data
+def _header_html(date_str, greeting):
+    return f"""
+    <div class="dashboard-title">
+        <h1>🧊 SNT Dashboard</h1>
+        <p>{greeting} | {date_str}</p>
+    </div>
+    """
+
+# Static footer HTML
+_FOOTER_HTML = """
+    <div class="footer">
+        <p>© 2025 SNT Health Analytics Dashboard | Version 1.0</p>
+        <p>Last updated: May 21, 2025</p>
+        <p>Developer: MS Kanu</p>
+    </div>
+    """
 
 # Initialize session state for module navigation
-if 'current_module' not in st.session_state:
-    st.session_state.current_module = None
+st.session_state.setdefault('current_module', None)
+
+# Turns `st.set_page_config(...)` statements into `pass`; the dashboard has
+# already set the page config, and a second call raises
+class _StripPageConfig(ast.NodeTransformer):
+    def visit_Expr(self, node):
+        call = node.value
+        if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                and call.func.attr == 'set_page_config'):
+            return ast.copy_location(ast.Pass(), node)
+        return node
+
+# Read a module, strip its st.set_page_config call and compile it once.
+# Keyed on the file's mtime so edits to the module invalidate the cache.
+@st.cache_resource
+def _load_and_compile(module_path, mtime):
+    # Read the module content
+    with open(module_path, 'r') as file:
+        source_code = file.read()
+    
+    tree = _StripPageConfig().visit(ast.parse(source_code, module_path))
+    return compile(tree, module_path, 'exec')
 
 # Function to safely import module without set_page_config issues
 def import_module_safely(module_path, module_name):
     """Import a module from file path while handling set_page_config"""
     try:
-        # Read the module content
-        with open(module_path, 'r') as file:
-            source_code = file.read()
-        
-        # Modify the source code to remove st.set_page_config call
-        modified_code = []
-        skip_line = False
-        inside_config = False
-        
-        for line in source_code.split('\n'):
-            if "st.set_page_config" in line:
-                skip_line = True
-                inside_config = True
-                continue
-            
-            if inside_config:
-                if ")" in line:
-                    inside_config = False
-                    skip_line = False
-                    continue
-            
-            if not skip_line:
-                modified_code.append(line)
+        code = _load_and_compile(module_path, os.path.getmtime(module_path))
         
         # Create a new module
         module = types.ModuleType(module_name)
@@ -170,34 +241,40 @@ def import_module_safely(module_path, module_name):
         # Add the module to sys.modules
         sys.modules[module_name] = module
         
-        # Execute the modified code in the module's namespace
-        exec('\n'.join(modified_code), module.__dict__)
+        # Execute the compiled code in the module's namespace
+        exec(code, module.__dict__)
         
         return module
     
     except Exception as e:
-        st.error(f"Error loading module: {str(e)}")
+        _render_error(f"Error loading module: {str(e)}", e)
         return None
 
-# Function to create a card for each module
-def create_module_card(name, info, pages_dir):
-    module_name = name.replace('.py', '').replace('_', ' ').title()
-    
-    card_html = f"""
-    <div class="module-card">
-        <h3><span class="module-icon">{info['icon']}</span>{module_name}</h3>
-        <p>{info['desc']}</p>
+# Render an error and its collapsible traceback as a single markdown block
+def _render_error(msg, exc):
+    tb = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+    st.markdown(f"""
+    <div class="error-box">
+        <strong>{html.escape(msg)}</strong>
+        <details><summary>Show details</summary><pre>{html.escape(tb)}</pre></details>
     </div>
-    """
-    
-    st.markdown(card_html, unsafe_allow_html=True)
-    
-    # Check if the module file exists
-    module_file_path = os.path.join(pages_dir, name)
-    file_exists = os.path.exists(module_file_path)
+    """, unsafe_allow_html=True)
+
+# Check which module files are present with a single directory listing
+@st.cache_data(ttl=30)
+def _module_availability(base_dir, names):
+    try:
+        present = set(os.listdir(base_dir))
+    except OSError:
+        present = set()
+    return {name: name in present for name in names}
+
+# Function to create the open button for each module
+def create_module_button(name, pages_dir, file_exists):
+    module_name = MODULE_CARDS[name]['display']
     
     if not file_exists:
-        st.warning(f"Module file not found: {module_file_path}")
+        st.warning(f"Module file not found: {os.path.join(pages_dir, name)}")
     
     if st.button(f"Open {module_name}", 
                  key=f"btn_{name}", 
@@ -205,19 +282,48 @@ def create_module_card(name, info, pages_dir):
         st.session_state.current_module = name
         st.experimental_rerun()
 
+# Run the selected module. Widgets inside the module only rerun this
+# fragment rather than the whole dashboard.
+@_fragment
+def _run_selected_module():
+    try:
+        # Extract module name without .py extension
+        module_name = st.session_state.current_module.replace('.py', '')
+        
+        # Get the module path
+        pages_dir = os.path.join(BASE_DIR, "pages")
+        module_path = os.path.join(pages_dir, st.session_state.current_module)
+        
+        # Display module title
+        st.markdown(f"<h2>{module_name.replace('_', ' ').title()}</h2>", unsafe_allow_html=True)
+        
+        # Import the module safely (without set_page_config issues)
+        module = import_module_safely(module_path, module_name)
+        
+        if module:
+            # Look the entry point up on the freshly executed module, so edits
+            # that add or remove run()/main() take effect on the next rerun
+            entrypoint = next(
+                (getattr(module, n) for n in ENTRYPOINTS if callable(getattr(module, n, None))), None)
+            
+            if entrypoint:
+                entrypoint()
+            # If there is none, we'll assume the module has already executed its code
+            else:
+                st.warning(f"Module {module_name} doesn't have a run() or main() function, but its code has been executed.")
+        else:
+            st.error(f"Failed to load module: {st.session_state.current_module}")
+    except Exception as e:
+        _render_error(f"Error running module: {type(e).__name__}: {str(e)}", e)
+
 # Main function to run the dashboard
 def main():
     # Apply custom CSS
     st.markdown(get_css(), unsafe_allow_html=True)
     
     # Create header
-    header_html = f"""
-    <div class="dashboard-title">
-        <h1>🧊 SNT Dashboard</h1>
-        <p>{get_greeting()} | {datetime.now().strftime("%A, %B %d, %Y")}</p>
-    </div>
-    """
-    st.markdown(header_html, unsafe_allow_html=True)
+    date_str = _date_string()
+    st.markdown(_header_html(date_str, get_greeting()), unsafe_allow_html=True)
     
     # If a module is selected, run it
     if st.session_state.current_module:
@@ -236,83 +342,26 @@ def main():
             st.session_state.current_module = None
             st.experimental_rerun()
         
-        try:
-            # Extract module name without .py extension
-            module_name = st.session_state.current_module.replace('.py', '')
-            
-            # Get the module path
-            base_dir = os.path.abspath(os.path.dirname(__file__))
-            pages_dir = os.path.join(base_dir, "pages")
-            module_path = os.path.join(pages_dir, st.session_state.current_module)
-            
-            # Display module title
-            st.markdown(f"<h2>{module_name.replace('_', ' ').title()}</h2>", unsafe_allow_html=True)
-            
-            # Import the module safely (without set_page_config issues)
-            module = import_module_safely(module_path, module_name)
-            
-            if module:
-                # Try to run the module
-                # First, try to call the run() function if it exists
-                if hasattr(module, 'run'):
-                    module.run()
-                # If not, try to find a main() function
-                elif hasattr(module, 'main'):
-                    module.main()
-                # If none of those work, we'll assume the module has already executed its code
-                else:
-                    st.warning(f"Module {module_name} doesn't have a run() or main() function, but its code has been executed.")
-            else:
-                st.error(f"Failed to load module: {st.session_state.current_module}")
-            
-            return
-        except Exception as e:
-            st.error(f"Error running module: {str(e)}")
-            st.write(f"Details: {type(e).__name__}: {str(e)}")
+        _run_selected_module()
+        return
     
     # Otherwise, show the main dashboard with the modules in 2 columns and 3 rows
     st.markdown("<h2>Select a Section</h2>", unsafe_allow_html=True)
     
-    # Define the modules with their descriptions and icons
-    modules = {
-    "Combine_files.py": {"icon": "", "desc": "Merge multiple datasets into unified data structure"},
-    "Rename_columns.py": {"icon": "", "desc": "Standardize and rename data columns for consistency"},
-    "Create_new_variables.py": {"icon": "", "desc": "Generate derived variables and calculated fields"},
-    "Outlier_detection_and_correction.py": {"icon": "", "desc": "Identify and handle data anomalies and outliers"}
-}
-    # Get the correct pages directory path
-    base_dir = os.path.abspath(os.path.dirname(__file__))
+    availability = _module_availability(BASE_DIR, tuple(MODULES))
 
     
-    # Create 2 columns
-    col1, col2 = st.columns(2)
-    
-    # Arrange modules in 2 columns and 3 rows
-    module_list = list(modules.items())
-    
-    # First column - 3 modules
-    with col1:
-        for i in range(0, len(module_list), 2):
-            if i < len(module_list):
-                name, info = module_list[i]
-                create_module_card(name, info, base_dir)
+    # Render every module card in a single grid
+    st.markdown(MODULE_GRID_HTML, unsafe_allow_html=True)
     
-    # Second column - 3 modules
-    with col2:
-        for i in range(1, len(module_list), 2):
-            if i < len(module_list):
-                name, info = module_list[i]
-                create_module_card(name, info, base_dir)
+    # Followed by one row with an open button per module
+    cols = st.columns(len(MODULES))
+    for col, name in zip(cols, MODULES):
+        with col:
+            create_module_button(name, BASE_DIR, availability[name])
     
     # Create footer
-    footer_html = """
-    <div class="footer">
-        <p>© 2025 SNT Health Analytics Dashboard | Version 1.0</p>
-        <p>Last updated: May 21, 2025</p>
-        <p>Developer: MS Kanu</p>
-    </div>
-    """
-    st.markdown(footer_html, unsafe_allow_html=True)
+    st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
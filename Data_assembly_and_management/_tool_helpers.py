@@ -0,0 +1,101 @@
+"""Helpers shared by the data assembly and management tools.
+
+The dashboards put this folder on sys.path before running a tool, and skip
+files starting with an underscore when listing tools, so this module is
+importable from every tool without showing up as one.
+"""
+import io
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# st.fragment is only available in newer Streamlit releases; fall back to a plain call
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+def read_excel_fast(source) -> pd.DataFrame:
+    """Read an Excel file with the Rust-based calamine engine, falling back to the default engine"""
+    try:
+        return pd.read_excel(source, engine='calamine')
+    except Exception:
+        # python-calamine missing, pandas too old for the engine, or a workbook it cannot read
+        source.seek(0)
+        return pd.read_excel(source)
+
+def downcast_numeric_columns(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Shrink numeric columns (all of them, or just `columns`) to the smallest dtype that holds their values exactly"""
+    for col in df.columns if columns is None else columns:
+        dtype = df[col].dtype
+        if not isinstance(dtype, np.dtype):
+            continue  # Leave pandas extension dtypes as they are
+
+        if dtype.kind in 'iu':
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif dtype.kind == 'f':
+            downcast = pd.to_numeric(df[col], downcast='float')
+            # to_numeric accepts small rounding errors; only keep lossless downcasts
+            if downcast.dtype != dtype and downcast.astype(dtype).equals(df[col]):
+                df[col] = downcast
+
+    return df
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to UTF-8 CSV bytes for a download button"""
+    # Encoded straight into a bytes buffer in chunks so the whole file
+    # never exists as one Python str
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8')
+    return buffer.getvalue()
+
+def frame_cached(key: str, df: pd.DataFrame, compute: Callable[[pd.DataFrame], Any]) -> Any:
+    """Return compute(df), reusing the value in session state under `key` while df is the frame it came from.
+
+    The tools share st.session_state.df, so a value stored on one tool's
+    upload path goes stale when another tool loads a different frame; tying
+    it to the frame's identity keeps it current. Only the frame itself is
+    weakly referenced, so values should not hold views of its data.
+    """
+    entry = st.session_state.get(key)
+    if entry is not None:
+        if entry[0]() is df:
+            return entry[1]
+        # Free the stale value before computing the new one
+        del st.session_state[key]
+
+    value = compute(df)
+    st.session_state[key] = (weakref.ref(df), value)
+    return value
+
+def parse_uploads(store_key: str, uploaded_files,
+                  parse: Callable[[str, bytes], Any]) -> List[Tuple[Any, Optional[Exception]]]:
+    """Parse uploads with parse(name, bytes), returning (result, error) for each in upload order.
+
+    Results are kept in session state under `store_key`, keyed on each
+    upload's file_id, so reruns reuse them. Only the files currently uploaded
+    are kept, so the store is bounded by what the session has open. `parse`
+    runs on worker threads and must not call Streamlit.
+    """
+    store = st.session_state.get(store_key) or {}
+
+    # Pull the bytes on the script thread so UploadedFile objects are not shared across threads
+    misses = [(uploaded_file.file_id, uploaded_file.name, uploaded_file.getvalue())
+              for uploaded_file in uploaded_files if uploaded_file.file_id not in store]
+
+    def run(miss):
+        file_id, name, data = miss
+        try:
+            return file_id, (parse(name, data), None)
+        except Exception as e:
+            return file_id, (None, e)
+
+    if misses:
+        # Parsing releases the GIL inside the C/C++ readers, so threads overlap the work
+        with ThreadPoolExecutor(max_workers=min(8, len(misses))) as executor:
+            store.update(executor.map(run, misses))
+
+    st.session_state[store_key] = {uploaded_file.file_id: store[uploaded_file.file_id]
+                                   for uploaded_file in uploaded_files}
+    return [store[uploaded_file.file_id] for uploaded_file in uploaded_files]
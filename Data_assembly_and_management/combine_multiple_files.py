@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
 import io
+import re
 from datetime import datetime
 from typing import List, Dict, Tuple
 import numpy as np
 
+from _tool_helpers import csv_bytes, downcast_numeric_columns, parse_uploads, read_excel_fast
+
 # Set page config
 st.set_page_config(
     page_title="File Combiner Tool",
@@ -123,28 +126,35 @@ if 'combined_df' not in st.session_state:
     st.session_state.combined_df = None
 if 'combination_log' not in st.session_state:
     st.session_state.combination_log = []
+if 'download_data' not in st.session_state:
+    st.session_state.download_data = None
+
+# Column headers treated as unnamed: "Unnamed..." (pandas' placeholder), "nan" or blank
+_UNNAMED_COLUMN_RE = re.compile(r'unnamed|nan\Z|\Z', re.IGNORECASE)
 
 def clean_dataframe(df: pd.DataFrame, filename: str) -> pd.DataFrame:
     """Clean dataframe by removing empty rows and unnamed columns"""
     original_shape = df.shape
     
-    # Remove rows where first column is empty/null
+    # Remove rows where first column is empty/null, in a single mask.
+    # Only text columns can hold blank strings, so numeric ones skip the strip.
     if len(df.columns) > 0:
-        first_col = df.columns[0]
-        df = df.dropna(subset=[first_col])
-        df = df[df[first_col].astype(str).str.strip() != '']
+        first_values = df.iloc[:, 0]
+        mask = first_values.notna()
+        if first_values.dtype == object or isinstance(first_values.dtype, pd.StringDtype):
+            mask &= first_values.astype('string').str.strip().ne('')
+        df = df.loc[mask]
     
     # Remove columns that are unnamed or have variations of 'Unnamed'
-    columns_to_keep = []
-    for col in df.columns:
-        col_str = str(col).lower().strip()
-        if not (col_str.startswith('unnamed') or col_str == 'nan' or col_str == ''):
-            columns_to_keep.append(col)
+    columns_to_keep = [col for col in df.columns if not _UNNAMED_COLUMN_RE.match(str(col).strip())]
     
-    df = df[columns_to_keep]
+    # Selecting columns copies every block, so only do it if something is dropped
+    if len(columns_to_keep) != len(df.columns):
+        df = df[columns_to_keep]
     
-    # Remove completely empty rows
-    df = df.dropna(how='all')
+    # Remove completely empty rows, skipping the drop when there are none
+    if df.isna().all(axis=1).any():
+        df = df.dropna(how='all')
     
     # Reset index
     df = df.reset_index(drop=True)
@@ -156,45 +166,67 @@ def clean_dataframe(df: pd.DataFrame, filename: str) -> pd.DataFrame:
     
     return df
 
-def read_file(uploaded_file) -> Tuple[pd.DataFrame, str]:
-    """Read uploaded file and return DataFrame and file type"""
+def read_csv_fast(source) -> pd.DataFrame:
+    """Read a CSV with the multithreaded pyarrow parser, falling back to the default engine"""
     try:
-        file_extension = uploaded_file.name.lower().split('.')[-1]
-        
-        if file_extension == 'csv':
-            df = pd.read_csv(uploaded_file)
-            file_type = 'CSV'
-        elif file_extension in ['xls', 'xlsx']:
-            df = pd.read_excel(uploaded_file)
-            file_type = 'Excel'
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+        return pd.read_csv(source, engine='pyarrow')
+    except Exception:
+        # pyarrow missing or unable to parse this file (e.g. ragged rows)
+        source.seek(0)
+        return pd.read_csv(source)
+
+def parse_file(file_name: str, file_bytes: bytes) -> Tuple[pd.DataFrame, str]:
+    """Parse raw file bytes into a DataFrame and file type"""
+    file_extension = file_name.lower().split('.')[-1]
+    
+    if file_extension == 'csv':
+        df = read_csv_fast(io.BytesIO(file_bytes))
+        file_type = 'CSV'
+    elif file_extension in ['xls', 'xlsx']:
+        df = read_excel_fast(io.BytesIO(file_bytes))
+        file_type = 'Excel'
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    return df, file_type
+
+def read_files(uploaded_files) -> List[Tuple[pd.DataFrame, str]]:
+    """Read uploaded files concurrently and return (DataFrame, file type) for each, in upload order"""
+    results = []
+    for uploaded_file, (parsed, error) in zip(uploaded_files, parse_uploads('parsed_files', uploaded_files, parse_file)):
+        if error is not None:
+            st.error(f"Error reading file {uploaded_file.name}: {str(error)}")
+            results.append((None, None))
+            continue
         
         # Clean the dataframe
-        df = clean_dataframe(df, uploaded_file.name)
-        
-        return df, file_type
-    except Exception as e:
-        st.error(f"Error reading file {uploaded_file.name}: {str(e)}")
-        return None, None
+        df, file_type = parsed
+        results.append((clean_dataframe(df, uploaded_file.name), file_type))
+    
+    return results
 
 def find_common_columns(dataframes: List[pd.DataFrame]) -> List[str]:
     """Find columns that are common across all dataframes"""
     if not dataframes:
         return []
     
+    # Shrink one working set in place; intersection_update takes the Index directly
     common_cols = set(dataframes[0].columns)
     for df in dataframes[1:]:
-        common_cols = common_cols.intersection(set(df.columns))
+        common_cols.intersection_update(df.columns)
     
-    return sorted(list(common_cols))
+    return sorted(common_cols)
 
 def get_all_columns(dataframes: List[pd.DataFrame]) -> List[str]:
     """Get all unique columns across all dataframes"""
     all_cols = set()
     for df in dataframes:
         all_cols.update(df.columns)
-    return sorted(list(all_cols))
+    return sorted(all_cols)
+
+def is_text_dtype(dtype) -> bool:
+    """Whether a dtype holds categorical/text values (object, string or category)"""
+    return pd.api.types.is_object_dtype(dtype) or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype))
 
 def reorder_columns_by_type(df: pd.DataFrame) -> pd.DataFrame:
     """Reorder columns to put categorical/text columns first, then numeric columns"""
@@ -202,13 +234,13 @@ def reorder_columns_by_type(df: pd.DataFrame) -> pd.DataFrame:
     categorical_cols = []
     numeric_cols = []
     
-    for col in df.columns:
+    for col, dtype in df.dtypes.items():
         if col == 'source_file':
             continue  # Handle source_file separately at the end
         
-        if df[col].dtype in ['object', 'string', 'category']:
+        if is_text_dtype(dtype):
             categorical_cols.append(col)
-        elif pd.api.types.is_numeric_dtype(df[col]):
+        elif pd.api.types.is_numeric_dtype(dtype):
             numeric_cols.append(col)
         else:
             # For datetime or other types, treat as categorical
@@ -221,98 +253,112 @@ def reorder_columns_by_type(df: pd.DataFrame) -> pd.DataFrame:
     
     return df[new_column_order]
 
-def combine_files_by_type(files_data: List[Dict]) -> Dict[str, pd.DataFrame]:
-    """Combine files by their type (CSV, Excel) including ALL columns"""
-    combined_dfs = {}
+def categorize_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Store low-cardinality text columns and source_file as categoricals to save memory"""
+    for col in df.select_dtypes(include='object').columns:
+        unique_count = df[col].nunique(dropna=True)
+        if unique_count and unique_count / len(df) < 0.5:
+            df[col] = df[col].astype('category')
     
-    # Group files by type
+    if 'source_file' in df.columns:
+        df['source_file'] = df['source_file'].astype('category')
+    
+    return df
+
+def group_files_by_type(files_data: List[Dict]) -> Dict[str, Dict]:
+    """Group files by type with each group's common and full column lists, computed once"""
     files_by_type = {}
     for file_data in files_data:
-        file_type = file_data['type']
-        if file_type not in files_by_type:
-            files_by_type[file_type] = []
-        files_by_type[file_type].append(file_data)
+        files_by_type.setdefault(file_data['type'], []).append(file_data)
     
-    # Combine files within each type
+    type_groups = {}
     for file_type, files in files_by_type.items():
+        if len(files) > 1:
+            dataframes = [file_data['dataframe'] for file_data in files]
+            common_cols = find_common_columns(dataframes)
+            all_cols = get_all_columns(dataframes)
+        else:
+            common_cols = all_cols = list(files[0]['dataframe'].columns)
+        
+        type_groups[file_type] = {'files': files, 'common': common_cols, 'all': all_cols}
+    
+    return type_groups
+
+def combine_files_by_type(type_groups: Dict[str, Dict]) -> Dict[str, pd.DataFrame]:
+    """Combine files by their type (CSV, Excel) including ALL columns"""
+    combined_dfs = {}
+    
+    # Combine files within each type
+    for file_type, group in type_groups.items():
+        files = group['files']
         if len(files) == 1:
             # Only one file of this type
             combined_df = files[0]['dataframe'].copy()
             combined_df['source_file'] = files[0]['name']
+            combined_df = categorize_text_columns(combined_df)
+            combined_df = downcast_numeric_columns(combined_df)
             combined_dfs[file_type] = reorder_columns_by_type(combined_df)
         else:
-            # Multiple files of the same type - combine ALL columns
-            dataframes = [file_data['dataframe'] for file_data in files]
-            all_columns = get_all_columns(dataframes)
-            
-            # Combine using ALL columns (common + uncommon)
-            combined_list = []
-            for i, file_data in enumerate(files):
-                df_copy = file_data['dataframe'].copy()
-                
-                # Add missing columns with NaN values
-                for col in all_columns:
-                    if col not in df_copy.columns:
-                        df_copy[col] = np.nan
-                
-                # Reorder columns to match all_columns order
-                df_copy = df_copy[all_columns]
-                
-                # Add source file column
-                df_copy['source_file'] = file_data['name']
-                combined_list.append(df_copy)
-            
-            combined_df = pd.concat(combined_list, ignore_index=True)
+            # Multiple files of the same type - combine ALL columns.
+            # concat takes the union of the columns and fills the gaps with NaN
+            # in one pass, so each file only needs its source tag added. A shallow
+            # copy is enough since only a new column is added and concat copies
+            # the data once.
+            tagged = []
+            for file_data in files:
+                df_tagged = file_data['dataframe'].copy(deep=False)
+                df_tagged['source_file'] = file_data['name']
+                tagged.append(df_tagged)
+            combined_df = pd.concat(tagged, ignore_index=True, sort=False)
+            combined_df = categorize_text_columns(combined_df)
+            combined_df = downcast_numeric_columns(combined_df)
             combined_dfs[file_type] = reorder_columns_by_type(combined_df)
     
     return combined_dfs
 
-def create_combination_log(files_data: List[Dict], combined_dfs: Dict[str, pd.DataFrame]) -> List[Dict]:
+def create_combination_log(type_groups: Dict[str, Dict], combined_dfs: Dict[str, pd.DataFrame]) -> List[Dict]:
     """Create a log of the combination process"""
     log = []
     
-    # Group files by type for logging
-    files_by_type = {}
-    for file_data in files_data:
-        file_type = file_data['type']
-        if file_type not in files_by_type:
-            files_by_type[file_type] = []
-        files_by_type[file_type].append(file_data)
+    for file_type, group in type_groups.items():
+        files = group['files']
+        log_entry = {
+            'file_type': file_type,
+            'files_combined': len(files),
+            'file_names': [f['name'] for f in files],
+            'common_columns': group['common'],
+            'all_columns': group['all'],
+            'unique_columns': len(group['all']),
+            'total_rows_before': sum(f['dataframe'].shape[0] for f in files),
+            'total_rows_after': combined_dfs[file_type].shape[0],
+            'columns_after': list(combined_dfs[file_type].columns)
+        }
+        log.append(log_entry)
     
-    for file_type, files in files_by_type.items():
-        if len(files) > 1:
-            dataframes = [file_data['dataframe'] for file_data in files]
-            common_cols = find_common_columns(dataframes)
-            all_cols = get_all_columns(dataframes)
-            
-            log_entry = {
-                'file_type': file_type,
-                'files_combined': len(files),
-                'file_names': [f['name'] for f in files],
-                'common_columns': common_cols,
-                'all_columns': all_cols,
-                'unique_columns': len(all_cols),
-                'total_rows_before': sum(df.shape[0] for df in dataframes),
-                'total_rows_after': combined_dfs[file_type].shape[0],
-                'columns_after': list(combined_dfs[file_type].columns)
-            }
-            log.append(log_entry)
+    return log
+
+def get_download_data() -> Tuple[str, bytes]:
+    """Build the CSV download once per combination and reuse it on later reruns"""
+    if st.session_state.download_data is None:
+        if len(st.session_state.combined_df) == 1:
+            # Single file type - download directly
+            file_type, df_to_download = list(st.session_state.combined_df.items())[0]
+            download_filename = f"combined_{file_type.lower()}_data"
         else:
-            # Single file
-            log_entry = {
-                'file_type': file_type,
-                'files_combined': 1,
-                'file_names': [files[0]['name']],
-                'common_columns': list(files[0]['dataframe'].columns),
-                'all_columns': list(files[0]['dataframe'].columns),
-                'unique_columns': len(files[0]['dataframe'].columns),
-                'total_rows_before': files[0]['dataframe'].shape[0],
-                'total_rows_after': combined_dfs[file_type].shape[0],
-                'columns_after': list(combined_dfs[file_type].columns)
-            }
-            log.append(log_entry)
+            # Multiple file types - combine all into one
+            all_dfs = []
+            for file_type, df in st.session_state.combined_df.items():
+                # Shallow copy: concat below copies the data anyway
+                df_tagged = df.copy(deep=False)
+                df_tagged['data_type'] = file_type
+                all_dfs.append(df_tagged)
+            
+            df_to_download = pd.concat(all_dfs, ignore_index=True, sort=False)
+            download_filename = "combined_all_data"
+        
+        st.session_state.download_data = (download_filename, csv_bytes(df_to_download))
     
-    return log
+    return st.session_state.download_data
 
 # File upload section
 st.markdown("""
@@ -334,8 +380,7 @@ if uploaded_files:
     files_data = []
     
     with st.spinner("Processing and cleaning uploaded files..."):
-        for uploaded_file in uploaded_files:
-            df, file_type = read_file(uploaded_file)
+        for uploaded_file, (df, file_type) in zip(uploaded_files, read_files(uploaded_files)):
             if df is not None:
                 files_data.append({
                     'name': uploaded_file.name,
@@ -346,8 +391,13 @@ if uploaded_files:
                 })
     
     if files_data:
-        # Store in session state
-        st.session_state.uploaded_files_data = files_data
+        # Store in session state. Only the file details are kept; the parsed
+        # frames come back from the session's parse store on each rerun, so
+        # holding them here would pin a second copy of every upload.
+        st.session_state.uploaded_files_data = [
+            {key: value for key, value in file_data.items() if key != 'dataframe'}
+            for file_data in files_data
+        ]
         
         # Display uploaded files summary
         st.subheader("📋 Uploaded Files Summary")
@@ -410,21 +460,14 @@ if uploaded_files:
         # Show column analysis by file type
         st.markdown("### 🔍 Column Analysis by File Type")
         
-        files_by_type = {}
-        for file_data in files_data:
-            file_type = file_data['type']
-            if file_type not in files_by_type:
-                files_by_type[file_type] = []
-            files_by_type[file_type].append(file_data)
+        # Grouping and column analysis shared with the combine step below
+        type_groups = group_files_by_type(files_data)
         
-        for file_type, files in files_by_type.items():
+        for file_type, group in type_groups.items():
+            files = group['files']
             if len(files) > 1:
-                dataframes = [f['dataframe'] for f in files]
-                common_cols = find_common_columns(dataframes)
-                all_cols = get_all_columns(dataframes)
-                unique_cols = set()
-                for f in files:
-                    unique_cols.update(f['columns'])
+                common_cols = group['common']
+                all_cols = group['all']
                 
                 st.markdown(f"""
                 <div class="column-info">
@@ -458,20 +501,24 @@ if uploaded_files:
             with st.spinner("Combining files with ALL columns..."):
                 try:
                     # Combine files by type
-                    combined_dfs = combine_files_by_type(files_data)
+                    combined_dfs = combine_files_by_type(type_groups)
                     
                     # Create combination log
-                    combination_log = create_combination_log(files_data, combined_dfs)
+                    combination_log = create_combination_log(type_groups, combined_dfs)
                     
                     # Store results in session state
                     st.session_state.combined_df = combined_dfs
                     st.session_state.combination_log = combination_log
+                    st.session_state.download_data = None
                     
                     st.success("✅ Files combined successfully with ALL columns preserved!")
                     # Removed st.rerun() - no automatic rerun after combination
                     
                 except Exception as e:
                     st.error(f"❌ Error combining files: {str(e)}")
+else:
+    # Nothing uploaded any more, so drop the parsed frames
+    st.session_state.pop('parsed_files', None)
 
 # Display results if files have been combined
 if st.session_state.combined_df:
@@ -528,12 +575,11 @@ if st.session_state.combined_df:
             numeric_cols = []
             other_cols = []
             
-            for col in combined_df.columns:
+            for col, dtype in combined_df.dtypes.items():
                 if col == 'source_file':
                     continue
                     
-                dtype = combined_df[col].dtype
-                if dtype in ['object', 'string', 'category']:
+                if is_text_dtype(dtype):
                     categorical_cols.append(col)
                 elif pd.api.types.is_numeric_dtype(dtype):
                     numeric_cols.append(col)
@@ -565,26 +611,8 @@ if st.session_state.combined_df:
     # Download options - CSV ONLY
     st.subheader("💾 Download Combined Data")
     
-    # Prepare download data
-    if len(st.session_state.combined_df) == 1:
-        # Single file type - download directly
-        file_type, df_to_download = list(st.session_state.combined_df.items())[0]
-        download_filename = f"combined_{file_type.lower()}_data"
-    else:
-        # Multiple file types - combine all into one
-        all_dfs = []
-        for file_type, df in st.session_state.combined_df.items():
-            df_copy = df.copy()
-            df_copy['data_type'] = file_type
-            all_dfs.append(df_copy)
-        
-        df_to_download = pd.concat(all_dfs, ignore_index=True, sort=False)
-        download_filename = "combined_all_data"
-    
-    # CSV download only
-    csv_buffer = io.StringIO()
-    df_to_download.to_csv(csv_buffer, index=False)
-    csv_data = csv_buffer.getvalue()
+    # Prepare download data (built once per combination)
+    download_filename, csv_data = get_download_data()
     
     st.download_button(
         label="📥 Download as CSV",
@@ -602,6 +630,8 @@ if st.session_state.uploaded_files_data:
         st.session_state.uploaded_files_data = []
         st.session_state.combined_df = None
         st.session_state.combination_log = []
+        st.session_state.download_data = None
+        st.session_state.pop('parsed_files', None)
         # Removed st.rerun() - no automatic rerun after reset
 
 # Show features and how it works when no files are uploaded
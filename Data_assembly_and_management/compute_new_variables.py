@@ -2,9 +2,12 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import io
+import gc
 from datetime import datetime
 from typing import List, Dict, Tuple
 
+from _tool_helpers import csv_bytes, downcast_numeric_columns, fragment, frame_cached, parse_uploads, read_excel_fast
+
 # Set page config
 st.set_page_config(
     page_title="Create New Variables Tool",
@@ -12,7 +15,7 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS for better styling
+# Custom CSS for better styling, sent together with the header as one element
 st.markdown("""
 <style>
     .main-header {
@@ -147,10 +150,7 @@ st.markdown("""
         color: black !important;
     }
 </style>
-""", unsafe_allow_html=True)
 
-# Header
-st.markdown("""
 <div class="main-header">
     <h1>🧮 Create New Variables Tool</h1>
     <p>Create new calculated variables using addition and subtraction operations</p>
@@ -158,38 +158,61 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'original_df' not in st.session_state:
-    st.session_state.original_df = None
-if 'computed_df' not in st.session_state:
-    st.session_state.computed_df = None
-if 'operations' not in st.session_state:
-    st.session_state.operations = []
-if 'variables_created' not in st.session_state:
-    st.session_state.variables_created = False
+SESSION_DEFAULTS = {
+    'df': None,
+    'original_df': None,
+    'new_vars_df': None,
+    'new_vars_stats': None,
+    'new_vars_download': None,
+    'parsed_upload': None,
+    'column_summary': None,
+    'operations': [],
+    'variables_created': False
+}
+for key, default in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, default)
+
+def _reset(keys: List[str]):
+    """Return session state keys to their defaults, freeing the data they held right away"""
+    for key in keys:
+        st.session_state.pop(key, None)
+    gc.collect()
+    
+    for key in keys:
+        st.session_state.setdefault(key, SESSION_DEFAULTS[key])
+
+def parse_file(file_name: str, file_bytes: bytes) -> pd.DataFrame:
+    """Parse raw file bytes into a DataFrame"""
+    file_extension = file_name.lower().split('.')[-1]
+    
+    if file_extension == 'csv':
+        df = pd.read_csv(io.BytesIO(file_bytes))
+    elif file_extension in ['xls', 'xlsx']:
+        df = read_excel_fast(io.BytesIO(file_bytes))
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    return df
 
 def read_file(uploaded_file):
     """Read uploaded file and return DataFrame"""
-    try:
-        file_extension = uploaded_file.name.lower().split('.')[-1]
-        
-        if file_extension == 'csv':
-            df = pd.read_csv(uploaded_file)
-        elif file_extension in ['xls', 'xlsx']:
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
-        
-        return df
-    except Exception as e:
-        st.error(f"Error reading file {uploaded_file.name}: {str(e)}")
+    (df, error), = parse_uploads('parsed_upload', [uploaded_file], parse_file)
+    if error is not None:
+        st.error(f"Error reading file {uploaded_file.name}: {str(error)}")
         return None
+    return df
 
 def get_numeric_columns(df):
     """Get only numeric columns from the dataframe"""
     return df.select_dtypes(include=[np.number]).columns.tolist()
 
+def arithmetic_dtype(*dtypes) -> np.dtype:
+    """Full-width dtype for arithmetic on (possibly downcast) columns, so results cannot overflow"""
+    dtype = np.result_type(*dtypes)
+    if dtype.kind in 'iu':
+        return np.result_type(dtype, np.int64)
+    return np.result_type(dtype, np.float64)
+
 def validate_operations(operations: List[Dict], df: pd.DataFrame) -> Tuple[List[str], List[str]]:
     """Validate all operations and return errors and warnings"""
     errors = []
@@ -199,16 +222,25 @@ def validate_operations(operations: List[Dict], df: pd.DataFrame) -> Tuple[List[
         errors.append("No operations defined. Please add at least one operation.")
         return errors, warnings
     
-    # Check for duplicate new variable names
-    new_names = [op['new_name'] for op in operations if op.get('new_name')]
-    if len(new_names) != len(set(new_names)):
-        errors.append("Duplicate new variable names found. Each new variable must have a unique name.")
-    
-    # Check for conflicts with existing columns
-    existing_cols = df.columns.tolist()
-    for new_name in new_names:
+    # Check for duplicate new variable names and conflicts with existing
+    # columns in one pass, using sets for the lookups
+    existing_cols = set(df.columns)
+    seen_names = set()
+    has_duplicates = False
+    conflicts = []
+    for op in operations:
+        new_name = op.get('new_name')
+        if not new_name:
+            continue
+        if new_name in seen_names:
+            has_duplicates = True
+        seen_names.add(new_name)
         if new_name in existing_cols:
-            errors.append(f"Variable name '{new_name}' already exists in the dataset.")
+            conflicts.append(f"Variable name '{new_name}' already exists in the dataset.")
+    
+    if has_duplicates:
+        errors.append("Duplicate new variable names found. Each new variable must have a unique name.")
+    errors.extend(conflicts)
     
     # Validate individual operations
     for i, op in enumerate(operations):
@@ -227,21 +259,264 @@ def validate_operations(operations: List[Dict], df: pd.DataFrame) -> Tuple[List[
     
     return errors, warnings
 
-def apply_operations(df: pd.DataFrame, operations: List[Dict]) -> pd.DataFrame:
-    """Apply all operations to create new variables"""
-    result_df = df.copy()
+def get_column_arrays(df: pd.DataFrame, numeric_cols: List[str]) -> Dict[str, np.ndarray]:
+    """NumPy views of the numeric columns for the operations to work on"""
+    # Extension dtypes (nullable Int64 etc.) are left out and keep pandas' own handling
+    return {col: df[col].to_numpy() for col in numeric_cols if isinstance(df[col].dtype, np.dtype)}
+
+def add_arrays(arrays: List[np.ndarray]) -> np.ndarray:
+    """Row-wise sum of columns, skipping missing values like DataFrame.sum(axis=1)"""
+    # Accumulate column by column into one output array instead of
+    # materializing a rows x columns block and reducing it
+    dtype = arithmetic_dtype(*(values.dtype for values in arrays))
+    
+    total = np.zeros(len(arrays[0]), dtype=dtype)
+    for values in arrays:
+        if values.dtype.kind == 'f':
+            np.add(total, values, out=total, where=~np.isnan(values))
+        else:
+            np.add(total, values, out=total)
+    
+    return total
+
+def subtract_arrays(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """First column minus second, with negative results set to 0 (missing values stay missing)"""
+    dtype = arithmetic_dtype(left.dtype, right.dtype)
+    
+    # One output array: the difference is written once and clamped in place
+    difference = np.subtract(left, right, dtype=dtype)
+    np.maximum(difference, 0, out=difference)
+    return difference
+
+def apply_operations(df: pd.DataFrame, operations: List[Dict],
+                     col_arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Apply all operations and return only the new variables, aligned to df's index"""
+    # Operations only read original columns, so every new column is computed
+    # from the per-upload column arrays directly
+    new_columns = {}
     
     for op in operations:
+        variables = op['variables']
+        arrays_ready = all(var in col_arrays for var in variables)
+        
         if op['operation'] == 'Addition':
-            result_df[op['new_name']] = result_df[op['variables']].sum(axis=1)
+            if arrays_ready:
+                new_columns[op['new_name']] = add_arrays([col_arrays[var] for var in variables])
+            else:
+                new_columns[op['new_name']] = df[variables].sum(axis=1)
         
         elif op['operation'] == 'Subtraction':
             # First variable minus second variable, negative results become 0
-            result_df[op['new_name']] = (
-                result_df[op['variables'][0]] - result_df[op['variables'][1]]
-            ).clip(lower=0)
+            if arrays_ready:
+                new_columns[op['new_name']] = subtract_arrays(col_arrays[variables[0]], col_arrays[variables[1]])
+            else:
+                new_columns[op['new_name']] = (df[variables[0]] - df[variables[1]]).clip(lower=0)
+    
+    return pd.DataFrame(new_columns, index=df.index)
+
+def with_new_variables(df: pd.DataFrame, new_vars_df: pd.DataFrame) -> pd.DataFrame:
+    """Join the new variables onto the original data, in one concat"""
+    # The joined frame is only read (displayed or written out), so it can
+    # share the original data's blocks instead of copying them
+    return pd.concat([df, new_vars_df], axis=1, copy=False)
+
+def build_operations_log(operations: List[Dict]) -> pd.DataFrame:
+    """Operations log sheet for the Excel download"""
+    log_data = []
+    for op in operations:
+        if op['operation'] == 'Addition':
+            formula = " + ".join(op['variables'])
+        else:
+            formula = f"{op['variables'][0]} - {op['variables'][1]} (negatives → 0)"
+        
+        log_data.append({
+            'New_Variable': op['new_name'],
+            'Operation': op['operation'],
+            'Source_Variables': ", ".join(op['variables']),
+            'Formula': formula,
+            'Created_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+    
+    return pd.DataFrame(log_data)
+
+def get_download_data() -> Tuple[bytes, bytes]:
+    """Build the CSV and Excel downloads once per set of new variables and reuse them on later reruns"""
+    if st.session_state.new_vars_download is None:
+        # Full dataset, joined once for both download formats
+        computed_df = with_new_variables(st.session_state.df, st.session_state.new_vars_df)
+        
+        # Excel download with operation log
+        excel_buffer = io.BytesIO()
+        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
+            # Main data
+            computed_df.to_excel(writer, sheet_name='Data_with_New_Variables', index=False)
+            
+            # Operations log
+            build_operations_log(st.session_state.operations).to_excel(writer, sheet_name='Operations_Log', index=False)
+        
+        st.session_state.new_vars_download = (csv_bytes(computed_df), excel_buffer.getvalue())
+    
+    return st.session_state.new_vars_download
+
+@fragment
+def operations_form(df: pd.DataFrame, numeric_cols: List[str]):
+    """Operation inputs and the create button; editing an operation only reruns this section"""
+    st.subheader("🧮 Define New Variables")
+    
+    # Number of operations
+    st.markdown("### How many new variables do you want to create?")
+    num_operations = st.number_input(
+        "Number of new variables",
+        min_value=1,
+        max_value=10,
+        value=1,
+        help="Enter the number of new variables you want to create"
+    )
+    
+    operations = []
+    
+    # Create operation forms
+    for i in range(num_operations):
+        st.markdown(f"""
+        <div class="operation-card">
+            <div class="operation-header">
+                <h4>New Variable {i+1}</h4>
+            </div>
+        """, unsafe_allow_html=True)
+        
+        # Operation type and new variable name
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            operation_type = st.selectbox(
+                "Operation Type",
+                ["Addition", "Subtraction"],
+                key=f"op_type_{i}",
+                help="Choose the mathematical operation"
+            )
+        
+        with col2:
+            new_var_name = st.text_input(
+                "New Variable Name",
+                key=f"new_name_{i}",
+                placeholder=f"Enter name for new variable {i+1}",
+                help="Enter a unique name for the new variable"
+            )
+        
+        # Variable selection based on operation type
+        if operation_type == "Addition":
+            st.markdown(f"""
+            <div class="operation-badge">➕ Addition</div>
+            <p><strong>Select 2 or more variables to add together</strong></p>
+            """, unsafe_allow_html=True)
+            
+            selected_vars = st.multiselect(
+                "Select variables to add",
+                numeric_cols,
+                key=f"vars_{i}",
+                help="Select at least 2 numeric variables to add together"
+            )
+            
+            if selected_vars and len(selected_vars) >= 2:
+                formula = " + ".join(selected_vars)
+                st.markdown(f"""
+                <div class="formula-display">
+                    <strong>Formula:</strong> {new_var_name or f'NewVar_{i+1}'} = {formula}
+                </div>
+                """, unsafe_allow_html=True)
+        
+        elif operation_type == "Subtraction":
+            st.markdown(f"""
+            <div class="operation-badge subtraction">➖ Subtraction</div>
+            <p><strong>Select exactly 2 variables (first - second, negatives become 0)</strong></p>
+            """, unsafe_allow_html=True)
+            
+            selected_vars = st.multiselect(
+                "Select variables for subtraction",
+                numeric_cols,
+                key=f"vars_{i}",
+                max_selections=2,
+                help="Select exactly 2 variables. The second will be subtracted from the first."
+            )
+            
+            if len(selected_vars) == 2:
+                formula = f"{selected_vars[0]} - {selected_vars[1]}"
+                st.markdown(f"""
+                <div class="formula-display">
+                    <strong>Formula:</strong> {new_var_name or f'NewVar_{i+1}'} = {formula} (negatives → 0)
+                </div>
+                """, unsafe_allow_html=True)
+            elif len(selected_vars) == 1:
+                st.info("Select one more variable for subtraction.")
+        
+        # Add operation to list if valid
+        if new_var_name and selected_vars:
+            if operation_type == "Addition" and len(selected_vars) >= 2:
+                operations.append({
+                    'operation': operation_type,
+                    'new_name': new_var_name,
+                    'variables': selected_vars
+                })
+            elif operation_type == "Subtraction" and len(selected_vars) == 2:
+                operations.append({
+                    'operation': operation_type,
+                    'new_name': new_var_name,
+                    'variables': selected_vars
+                })
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("---")
+    
+    # Create variables button
+    if st.button("🧮 Create New Variables", type="primary"):
+        # Validate operations
+        errors, warnings = validate_operations(operations, df)
+        
+        if errors:
+            for error in errors:
+                st.error(f"❌ {error}")
+        else:
+            # Show warnings if any
+            for warning in warnings:
+                st.warning(f"⚠️ {warning}")
+            
+            # Apply operations
+            try:
+                # Only the new columns are kept; the full dataset is
+                # joined on demand for "Show all columns" and downloads
+                new_vars_df = apply_operations(df, operations, get_column_arrays(df, numeric_cols))
+                
+                # Store results
+                st.session_state.new_vars_df = new_vars_df
+                st.session_state.new_vars_stats = new_vars_df.describe()
+                st.session_state.new_vars_download = None
+                st.session_state.operations = operations
+                st.session_state.variables_created = True
+                
+                st.success("✅ New variables created successfully!")
+                st.rerun()
+                
+            except Exception as e:
+                st.error(f"❌ Error creating variables: {str(e)}")
+
+@fragment
+def new_variables_preview():
+    """Preview of the dataset with new variables; toggling "Show all columns" only reruns this section"""
+    st.markdown("### 📈 Dataset with New Variables")
+    
+    # Show only new columns first, then option to see all
+    new_cols = [op['new_name'] for op in st.session_state.operations]
+    
+    show_all = st.checkbox("Show all columns", value=False)
+    
+    if show_all:
+        display_df = with_new_variables(st.session_state.df, st.session_state.new_vars_df)
+        st.markdown(f"**Showing all {len(display_df.columns)} columns**")
+    else:
+        display_df = st.session_state.new_vars_df
+        st.markdown(f"**Showing {len(new_cols)} new variables** (check box above to see all columns)")
     
-    return result_df
+    st.dataframe(display_df, use_container_width=True, height=400)
 
 # File upload section
 if st.session_state.df is None:
@@ -266,12 +541,20 @@ if st.session_state.df is None:
             if len(numeric_cols) < 2:
                 st.error("❌ Dataset must have at least 2 numeric columns to create new variables.")
             else:
+                # Store numeric columns in their smallest exact dtype
+                df = downcast_numeric_columns(df, numeric_cols)
+                
                 # Store in session state
                 st.session_state.df = df
-                st.session_state.original_df = df.copy()
+                
+                # The uploaded frame is never modified in place, so the
+                # original can share its data rather than duplicate it
+                st.session_state.original_df = df.copy(deep=False)
                 
                 # Reset state when new file is uploaded
-                st.session_state.computed_df = None
+                st.session_state.new_vars_df = None
+                st.session_state.new_vars_stats = None
+                st.session_state.new_vars_download = None
                 st.session_state.operations = []
                 st.session_state.variables_created = False
                 
@@ -291,54 +574,43 @@ if st.session_state.df is None:
 # Main content when file is uploaded
 if st.session_state.df is not None:
     df = st.session_state.df
-    numeric_cols = get_numeric_columns(df)
+    
+    # Column lists for the overview and operation inputs, scanned once per
+    # frame so later reruns do not rescan the dtypes
+    numeric_cols, text_cols_count = frame_cached(
+        'column_summary', df,
+        lambda frame: (get_numeric_columns(frame), frame.select_dtypes(include=['object']).shape[1]))
     
     # Reset button
     if st.button("🔄 Upload New File", type="secondary"):
         # Reset everything
-        st.session_state.df = None
-        st.session_state.original_df = None
-        st.session_state.computed_df = None
-        st.session_state.operations = []
-        st.session_state.variables_created = False
+        _reset(list(SESSION_DEFAULTS))
         st.rerun()
     
     # Show current file stats
     st.subheader("📊 Current Dataset Overview")
     
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.markdown(f"""
+    # All four stats cards laid out in one grid, emitted as one block
+    st.markdown(f"""
+    <div style="display:grid;grid-template-columns:repeat(4,1fr);gap:1rem">
         <div class="stats-card">
             <h3>{df.shape[0]:,}</h3>
             <p>Rows</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
         <div class="stats-card">
             <h3>{df.shape[1]}</h3>
             <p>Total Columns</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
         <div class="stats-card">
             <h3>{len(numeric_cols)}</h3>
             <p>Numeric Columns</p>
         </div>
-        """, unsafe_allow_html=True)
-    
-    with col4:
-        text_cols = df.select_dtypes(include=['object']).shape[1]
-        st.markdown(f"""
         <div class="stats-card">
-            <h3>{text_cols}</h3>
+            <h3>{text_cols_count}</h3>
             <p>Text Columns</p>
         </div>
-        """, unsafe_allow_html=True)
+    </div>
+    """, unsafe_allow_html=True)
     
     # Show available numeric columns
     st.subheader("🔢 Available Numeric Columns")
@@ -346,142 +618,10 @@ if st.session_state.df is not None:
     
     # Operations definition section
     if not st.session_state.variables_created:
-        st.subheader("🧮 Define New Variables")
-        
-        # Number of operations
-        st.markdown("### How many new variables do you want to create?")
-        num_operations = st.number_input(
-            "Number of new variables",
-            min_value=1,
-            max_value=10,
-            value=1,
-            help="Enter the number of new variables you want to create"
-        )
-        
-        operations = []
-        
-        # Create operation forms
-        for i in range(num_operations):
-            st.markdown(f"""
-            <div class="operation-card">
-                <div class="operation-header">
-                    <h4>New Variable {i+1}</h4>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            # Operation type and new variable name
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                operation_type = st.selectbox(
-                    "Operation Type",
-                    ["Addition", "Subtraction"],
-                    key=f"op_type_{i}",
-                    help="Choose the mathematical operation"
-                )
-            
-            with col2:
-                new_var_name = st.text_input(
-                    "New Variable Name",
-                    key=f"new_name_{i}",
-                    placeholder=f"Enter name for new variable {i+1}",
-                    help="Enter a unique name for the new variable"
-                )
-            
-            # Variable selection based on operation type
-            if operation_type == "Addition":
-                st.markdown(f"""
-                <div class="operation-badge">➕ Addition</div>
-                <p><strong>Select 2 or more variables to add together</strong></p>
-                """, unsafe_allow_html=True)
-                
-                selected_vars = st.multiselect(
-                    "Select variables to add",
-                    numeric_cols,
-                    key=f"vars_{i}",
-                    help="Select at least 2 numeric variables to add together"
-                )
-                
-                if selected_vars and len(selected_vars) >= 2:
-                    formula = " + ".join(selected_vars)
-                    st.markdown(f"""
-                    <div class="formula-display">
-                        <strong>Formula:</strong> {new_var_name or f'NewVar_{i+1}'} = {formula}
-                    </div>
-                    """, unsafe_allow_html=True)
-            
-            elif operation_type == "Subtraction":
-                st.markdown(f"""
-                <div class="operation-badge subtraction">➖ Subtraction</div>
-                <p><strong>Select exactly 2 variables (first - second, negatives become 0)</strong></p>
-                """, unsafe_allow_html=True)
-                
-                selected_vars = st.multiselect(
-                    "Select variables for subtraction",
-                    numeric_cols,
-                    key=f"vars_{i}",
-                    max_selections=2,
-                    help="Select exactly 2 variables. The second will be subtracted from the first."
-                )
-                
-                if len(selected_vars) == 2:
-                    formula = f"{selected_vars[0]} - {selected_vars[1]}"
-                    st.markdown(f"""
-                    <div class="formula-display">
-                        <strong>Formula:</strong> {new_var_name or f'NewVar_{i+1}'} = {formula} (negatives → 0)
-                    </div>
-                    """, unsafe_allow_html=True)
-                elif len(selected_vars) == 1:
-                    st.info("Select one more variable for subtraction.")
-            
-            # Add operation to list if valid
-            if new_var_name and selected_vars:
-                if operation_type == "Addition" and len(selected_vars) >= 2:
-                    operations.append({
-                        'operation': operation_type,
-                        'new_name': new_var_name,
-                        'variables': selected_vars
-                    })
-                elif operation_type == "Subtraction" and len(selected_vars) == 2:
-                    operations.append({
-                        'operation': operation_type,
-                        'new_name': new_var_name,
-                        'variables': selected_vars
-                    })
-            
-            st.markdown("</div>", unsafe_allow_html=True)
-            st.markdown("---")
-        
-        # Create variables button
-        if st.button("🧮 Create New Variables", type="primary"):
-            # Validate operations
-            errors, warnings = validate_operations(operations, df)
-            
-            if errors:
-                for error in errors:
-                    st.error(f"❌ {error}")
-            else:
-                # Show warnings if any
-                for warning in warnings:
-                    st.warning(f"⚠️ {warning}")
-                
-                # Apply operations
-                try:
-                    computed_df = apply_operations(df, operations)
-                    
-                    # Store results
-                    st.session_state.computed_df = computed_df
-                    st.session_state.operations = operations
-                    st.session_state.variables_created = True
-                    
-                    st.success("✅ New variables created successfully!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ Error creating variables: {str(e)}")
+        operations_form(df, numeric_cols)
 
 # Show results if variables have been created
-if st.session_state.variables_created and st.session_state.computed_df is not None:
+if st.session_state.variables_created and st.session_state.new_vars_df is not None:
     st.subheader("📊 Results")
     
     # Show operation summary
@@ -503,38 +643,22 @@ if st.session_state.variables_created and st.session_state.computed_df is not No
         """, unsafe_allow_html=True)
     
     # Display computed dataframe
-    st.markdown("### 📈 Dataset with New Variables")
-    
-    # Show only new columns first, then option to see all
-    new_cols = [op['new_name'] for op in st.session_state.operations]
-    
-    show_all = st.checkbox("Show all columns", value=False)
-    
-    if show_all:
-        display_df = st.session_state.computed_df
-        st.markdown(f"**Showing all {len(display_df.columns)} columns**")
-    else:
-        display_df = st.session_state.computed_df[new_cols]
-        st.markdown(f"**Showing {len(new_cols)} new variables** (check box above to see all columns)")
-    
-    st.dataframe(display_df, use_container_width=True, height=400)
+    new_variables_preview()
     
     # Summary statistics for new variables
     st.markdown("### 📊 Statistics for New Variables")
-    new_vars_stats = st.session_state.computed_df[new_cols].describe()
-    st.dataframe(new_vars_stats, use_container_width=True)
+    st.dataframe(st.session_state.new_vars_stats, use_container_width=True)
     
     # Download section
     st.markdown("### 💾 Download Dataset with New Variables")
     
+    # Prepare download data (built once per set of new variables)
+    csv_data, excel_data = get_download_data()
+    
     col1, col2 = st.columns(2)
     
     with col1:
         # CSV download
-        csv_buffer = io.StringIO()
-        st.session_state.computed_df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-        
         st.download_button(
             label="📥 Download as CSV",
             data=csv_data,
@@ -545,32 +669,6 @@ if st.session_state.variables_created and st.session_state.computed_df is not No
     
     with col2:
         # Excel download with operation log
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            # Main data
-            st.session_state.computed_df.to_excel(writer, sheet_name='Data_with_New_Variables', index=False)
-            
-            # Operations log
-            log_data = []
-            for op in st.session_state.operations:
-                if op['operation'] == 'Addition':
-                    formula = " + ".join(op['variables'])
-                else:
-                    formula = f"{op['variables'][0]} - {op['variables'][1]} (negatives → 0)"
-                
-                log_data.append({
-                    'New_Variable': op['new_name'],
-                    'Operation': op['operation'],
-                    'Source_Variables': ", ".join(op['variables']),
-                    'Formula': formula,
-                    'Created_Date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                })
-            
-            log_df = pd.DataFrame(log_data)
-            log_df.to_excel(writer, sheet_name='Operations_Log', index=False)
-        
-        excel_data = excel_buffer.getvalue()
-        
         st.download_button(
             label="📥 Download as Excel",
             data=excel_data,
@@ -581,9 +679,7 @@ if st.session_state.variables_created and st.session_state.computed_df is not No
     
     # Button to create different variables
     if st.button("🧮 Create Different Variables", type="secondary"):
-        st.session_state.variables_created = False
-        st.session_state.computed_df = None
-        st.session_state.operations = []
+        _reset(['new_vars_df', 'new_vars_stats', 'new_vars_download', 'operations', 'variables_created'])
         st.rerun()
 
 # Show features when no file is uploaded
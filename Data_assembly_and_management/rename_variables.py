@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
 import io
+import gc
 from datetime import datetime
 from typing import Dict, List
 
+from _tool_helpers import csv_bytes, fragment, frame_cached, parse_uploads
+
 # Set page config
 st.set_page_config(
     page_title="Variable Rename Tool",
@@ -144,33 +147,65 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if 'df' not in st.session_state:
-    st.session_state.df = None
-if 'original_df' not in st.session_state:
-    st.session_state.original_df = None
-if 'renamed_df' not in st.session_state:
-    st.session_state.renamed_df = None
-if 'rename_mapping' not in st.session_state:
-    st.session_state.rename_mapping = {}
-if 'columns_renamed' not in st.session_state:
-    st.session_state.columns_renamed = False
+SESSION_DEFAULTS = {
+    'df': None,
+    'original_df': None,
+    'renamed_df': None,
+    'rename_mapping': {},
+    'columns_renamed': False,
+    'overview_stats': None,
+    'renamed_csv': None,
+    'renamed_summary': None,
+    'parsed_upload': None
+}
+for key, default in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, default)
+
+def _reset(keys: List[str]):
+    """Return session state keys to their defaults, freeing the data they held right away"""
+    for key in keys:
+        st.session_state.pop(key, None)
+    gc.collect()
+    
+    for key in keys:
+        st.session_state.setdefault(key, SESSION_DEFAULTS[key])
+
+def parse_file(file_name, file_bytes):
+    """Parse raw file bytes into a DataFrame"""
+    file_extension = file_name.lower().split('.')[-1]
+    
+    if file_extension == 'csv':
+        df = pd.read_csv(io.BytesIO(file_bytes))
+    elif file_extension in ['xls', 'xlsx']:
+        df = pd.read_excel(io.BytesIO(file_bytes))
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+    
+    return df
 
 def read_file(uploaded_file):
     """Read uploaded file and return DataFrame"""
-    try:
-        file_extension = uploaded_file.name.lower().split('.')[-1]
-        
-        if file_extension == 'csv':
-            df = pd.read_csv(uploaded_file)
-        elif file_extension in ['xls', 'xlsx']:
-            df = pd.read_excel(uploaded_file)
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
-        
-        return df
-    except Exception as e:
-        st.error(f"Error reading file {uploaded_file.name}: {str(e)}")
+    (df, error), = parse_uploads('parsed_upload', [uploaded_file], parse_file)
+    if error is not None:
+        st.error(f"Error reading file {uploaded_file.name}: {str(error)}")
+        return None
+    return df
+
+def get_overview_stats(df):
+    """Compute the dataset overview counts shown in the stats cards"""
+    return {
+        'rows': df.shape[0],
+        'columns': df.shape[1],
+        'numeric': df.select_dtypes(include=['int64', 'float64']).shape[1],
+        'text': df.select_dtypes(include=['object']).shape[1]
+    }
+
+def describe_numeric(df):
+    """Summary statistics for the numeric columns, or None if there are none"""
+    numeric_data = df.select_dtypes(include=['int64', 'float64'])
+    if numeric_data.empty:
         return None
+    return numeric_data.describe()
 
 def get_column_type(dtype):
     """Get user-friendly column type and corresponding CSS class"""
@@ -214,6 +249,83 @@ def validate_new_names(new_names: Dict[str, str], original_columns: List[str]) -
     
     return valid_mapping, errors, warnings
 
+@fragment
+def rename_form(df):
+    """Rename inputs and preview; typing a name only reruns this section"""
+    st.subheader("✏️ Rename Column Variables")
+    st.markdown("Enter new names for the columns you want to rename. Leave blank to keep the original name.")
+    
+    # Create rename interface
+    new_names = {}
+    
+    # Display columns in pairs (old name | new name input)
+    for i, column in enumerate(df.columns):
+        col_type, css_class = get_column_type(df[column].dtype)
+        
+        # Create two columns for each variable
+        col_left, col_right = st.columns([1, 1])
+        
+        with col_left:
+            st.markdown(f"""
+            <div class="column-rename-card">
+                <strong>{column}</strong>
+                <span class="column-type-badge {css_class}">{col_type}</span>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col_right:
+            new_name = st.text_input(
+                "New name",
+                key=f"rename_{i}",
+                placeholder=f"Enter new name for '{column}'",
+                label_visibility="collapsed"
+            )
+            new_names[column] = new_name
+    
+    # Rename button and validation
+    st.markdown("---")
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button("✏️ Rename Variables", type="primary"):
+            # Validate new names
+            valid_mapping, errors, warnings = validate_new_names(new_names, df.columns.tolist())
+            
+            if errors:
+                for error in errors:
+                    st.error(f"❌ {error}")
+            else:
+                if not valid_mapping:
+                    st.warning("⚠️ No column names to change. Please enter at least one new name.")
+                else:
+                    # Show warnings if any
+                    for warning in warnings:
+                        st.warning(f"⚠️ {warning}")
+                    
+                    # Apply renaming
+                    try:
+                        renamed_df = df.rename(columns=valid_mapping)
+                        
+                        # Store results
+                        st.session_state.renamed_df = renamed_df
+                        st.session_state.rename_mapping = valid_mapping
+                        st.session_state.columns_renamed = True
+                        
+                        st.success("✅ Variables renamed successfully!")
+                        st.rerun()
+                        
+                    except Exception as e:
+                        st.error(f"❌ Error renaming variables: {str(e)}")
+    
+    with col2:
+        # Show preview of changes
+        if any(name.strip() for name in new_names.values()):
+            valid_mapping, errors, warnings = validate_new_names(new_names, df.columns.tolist())
+            if valid_mapping and not errors:
+                st.markdown("**Preview of changes:**")
+                for old_name, new_name in valid_mapping.items():
+                    st.markdown(f"• `{old_name}` → `{new_name}`")
+
 # File upload section
 if st.session_state.df is None:
     st.markdown("""
@@ -261,21 +373,18 @@ if st.session_state.df is not None:
     # Reset button
     if st.button("🔄 Upload New File", type="secondary"):
         # Reset everything
-        st.session_state.df = None
-        st.session_state.original_df = None
-        st.session_state.renamed_df = None
-        st.session_state.rename_mapping = {}
-        st.session_state.columns_renamed = False
+        _reset(list(SESSION_DEFAULTS))
         st.rerun()
     
-    # Show current file stats
+    # Show current file stats, computed once per frame
     st.subheader("📊 Current Dataset Overview")
+    stats = frame_cached('overview_stats', df, get_overview_stats)
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.markdown(f"""
         <div class="stats-card">
-            <h3>{df.shape[0]:,}</h3>
+            <h3>{stats['rows']:,}</h3>
             <p>Rows</p>
         </div>
         """, unsafe_allow_html=True)
@@ -283,104 +392,30 @@ if st.session_state.df is not None:
     with col2:
         st.markdown(f"""
         <div class="stats-card">
-            <h3>{df.shape[1]}</h3>
+            <h3>{stats['columns']}</h3>
             <p>Columns</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col3:
-        numeric_cols = df.select_dtypes(include=['int64', 'float64']).shape[1]
         st.markdown(f"""
         <div class="stats-card">
-            <h3>{numeric_cols}</h3>
+            <h3>{stats['numeric']}</h3>
             <p>Numeric</p>
         </div>
         """, unsafe_allow_html=True)
     
     with col4:
-        text_cols = df.select_dtypes(include=['object']).shape[1]
         st.markdown(f"""
         <div class="stats-card">
-            <h3>{text_cols}</h3>
+            <h3>{stats['text']}</h3>
             <p>Text</p>
         </div>
         """, unsafe_allow_html=True)
     
     # Column renaming section
     if not st.session_state.columns_renamed:
-        st.subheader("✏️ Rename Column Variables")
-        st.markdown("Enter new names for the columns you want to rename. Leave blank to keep the original name.")
-        
-        # Create rename interface
-        new_names = {}
-        
-        # Display columns in pairs (old name | new name input)
-        for i, column in enumerate(df.columns):
-            col_type, css_class = get_column_type(df[column].dtype)
-            
-            # Create two columns for each variable
-            col_left, col_right = st.columns([1, 1])
-            
-            with col_left:
-                st.markdown(f"""
-                <div class="column-rename-card">
-                    <strong>{column}</strong>
-                    <span class="column-type-badge {css_class}">{col_type}</span>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col_right:
-                new_name = st.text_input(
-                    "New name",
-                    key=f"rename_{i}",
-                    placeholder=f"Enter new name for '{column}'",
-                    label_visibility="collapsed"
-                )
-                new_names[column] = new_name
-        
-        # Rename button and validation
-        st.markdown("---")
-        
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            if st.button("✏️ Rename Variables", type="primary"):
-                # Validate new names
-                valid_mapping, errors, warnings = validate_new_names(new_names, df.columns.tolist())
-                
-                if errors:
-                    for error in errors:
-                        st.error(f"❌ {error}")
-                else:
-                    if not valid_mapping:
-                        st.warning("⚠️ No column names to change. Please enter at least one new name.")
-                    else:
-                        # Show warnings if any
-                        for warning in warnings:
-                            st.warning(f"⚠️ {warning}")
-                        
-                        # Apply renaming
-                        try:
-                            renamed_df = df.rename(columns=valid_mapping)
-                            
-                            # Store results
-                            st.session_state.renamed_df = renamed_df
-                            st.session_state.rename_mapping = valid_mapping
-                            st.session_state.columns_renamed = True
-                            
-                            st.success("✅ Variables renamed successfully!")
-                            st.rerun()
-                            
-                        except Exception as e:
-                            st.error(f"❌ Error renaming variables: {str(e)}")
-        
-        with col2:
-            # Show preview of changes
-            if any(name.strip() for name in new_names.values()):
-                valid_mapping, errors, warnings = validate_new_names(new_names, df.columns.tolist())
-                if valid_mapping and not errors:
-                    st.markdown("**Preview of changes:**")
-                    for old_name, new_name in valid_mapping.items():
-                        st.markdown(f"• `{old_name}` → `{new_name}`")
+        rename_form(df)
 
 # Show results if variables have been renamed
 if st.session_state.columns_renamed and st.session_state.renamed_df is not None:
@@ -432,9 +467,9 @@ if st.session_state.columns_renamed and st.session_state.renamed_df is not None:
     
     # Summary statistics
     st.markdown("### 📊 Dataset Statistics")
-    numeric_data = st.session_state.renamed_df.select_dtypes(include=['int64', 'float64'])
-    if not numeric_data.empty:
-        st.dataframe(numeric_data.describe(), use_container_width=True)
+    numeric_summary = frame_cached('renamed_summary', st.session_state.renamed_df, describe_numeric)
+    if numeric_summary is not None:
+        st.dataframe(numeric_summary, use_container_width=True)
     else:
         st.info("No numeric columns found for statistical summary.")
     
@@ -444,10 +479,8 @@ if st.session_state.columns_renamed and st.session_state.renamed_df is not None:
     col1, col2 = st.columns(2)
     
     with col1:
-        # CSV download
-        csv_buffer = io.StringIO()
-        st.session_state.renamed_df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
+        # CSV download, encoded once per renamed frame so reruns skip re-encoding
+        csv_data = frame_cached('renamed_csv', st.session_state.renamed_df, csv_bytes)
         
         st.download_button(
             label="📥 Download as CSV",
@@ -490,9 +523,7 @@ if st.session_state.columns_renamed and st.session_state.renamed_df is not None:
     
     # Button to rename different variables
     if st.button("✏️ Rename Different Variables", type="secondary"):
-        st.session_state.columns_renamed = False
-        st.session_state.renamed_df = None
-        st.session_state.rename_mapping = {}
+        _reset(['columns_renamed', 'renamed_df', 'rename_mapping', 'renamed_csv', 'renamed_summary'])
         st.rerun()
 
 # Show features when no file is uploaded
@@ -1,4 +1,5 @@
 import streamlit as st
+import ast
 import importlib
 import os
 import sys
@@ -8,6 +9,7 @@ import pandas as pd
 from datetime import datetime
 import json
 import base64
+import functools
 import gc
 
 # Try to import psutil for memory monitoring (optional)
@@ -25,6 +27,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Directory holding the dashboard and its module folders
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
 # Define color theme - light blue palette
 COLORS = {
     "primary": "#1E88E5",       # Primary blue
@@ -35,12 +40,17 @@ COLORS = {
 }
 
 # Memory cleanup function
-def clear_memory():
-    """Clear memory by removing cached data and running garbage collection"""
+def clear_memory(clear_caches=True):
+    """Clear memory by removing cached data and running garbage collection.
+    
+    Routine cleanups pass clear_caches=False so the app-wide Streamlit
+    caches survive; only an explicit or emergency clear drops them.
+    """
     try:
         # Clear Streamlit cache
-        st.cache_data.clear()
-        st.cache_resource.clear()
+        if clear_caches:
+            st.cache_data.clear()
+            st.cache_resource.clear()
         
         # Clear pandas cache if any
         if hasattr(pd, '_cache'):
@@ -58,12 +68,10 @@ def clear_memory():
         # Force garbage collection
         gc.collect()
         
-        # Clear any matplotlib figures if imported
-        try:
-            import matplotlib.pyplot as plt
+        # Clear any matplotlib figures if pyplot has been imported by a module
+        plt = sys.modules.get('matplotlib.pyplot')
+        if plt is not None:
             plt.close('all')
-        except ImportError:
-            pass
         
         return True
     except Exception as e:
@@ -118,7 +126,7 @@ def cleanup_button(label, key=None, **kwargs):
     """Custom button that automatically cleans memory when clicked"""
     button_clicked = st.button(label, key=key, **kwargs)
     if button_clicked:
-        clear_memory()
+        clear_memory(clear_caches=False)
     return button_clicked
 
 # Function to encode image to base64
@@ -134,9 +142,9 @@ def get_image_base64(image_path):
         st.error(f"Error loading image {image_path}: {str(e)}")
         return None
 
-# CSS for styling the dashboard with improved responsiveness
-def get_css():
-    return f"""
+# CSS for styling the dashboard with improved responsiveness,
+# formatted once at import since COLORS never changes
+_CSS_HTML = f"""
     <style>
         /* Main background */
         .stApp {{
@@ -526,6 +534,18 @@ def get_css():
     </style>
     """
 
+def get_css():
+    return _CSS_HTML
+
+# Static footer HTML
+_FOOTER_HTML = """
+    <div class="footer">
+        <p>© 2025 Data Management and Analysis Tool | Version 1.0</p>
+        <p>Last updated: May 21, 2025</p>
+        <p>Developer: MS Kanu</p>
+    </div>
+    """
+
 # Generate a greeting based on time of day
 def get_greeting():
     current_hour = datetime.now().hour
@@ -584,15 +604,12 @@ def get_memory_status_class():
         except:
             return "memory-normal"
 
-# Improved function to create header with better responsiveness
-def create_header_with_images():
-    """Create the dashboard header with responsive images and memory management"""
-    # Get the base directory
-    base_dir = os.path.abspath(os.path.dirname(__file__))
-    
+# Header HTML with greeting, date and logos, rebuilt at most once a minute
+@st.cache_data(ttl=60)
+def _header_html():
     # Image paths
-    nmcp_path = os.path.join(base_dir, "NMCP.png")
-    icf_path = os.path.join(base_dir, "ICF-SL.jpg")
+    nmcp_path = os.path.join(BASE_DIR, "NMCP.png")
+    icf_path = os.path.join(BASE_DIR, "ICF-SL.jpg")
     
     # Get base64 encoded images
     nmcp_base64 = get_image_base64(nmcp_path)
@@ -619,8 +636,12 @@ def create_header_with_images():
         </div>
     </div>
     """
-    
-    st.markdown(header_html, unsafe_allow_html=True)
+    return header_html
+
+# Improved function to create header with better responsiveness
+def create_header_with_images():
+    """Create the dashboard header with responsive images and memory management"""
+    st.markdown(_header_html(), unsafe_allow_html=True)
     
     # Check memory and show warnings
     warning_level = check_memory_and_warn()
@@ -676,36 +697,43 @@ if 'current_sub_module' not in st.session_state:
 if 'navigation_stack' not in st.session_state:
     st.session_state.navigation_stack = []
 
+# Turns `st.set_page_config(...)` statements into `pass`; the dashboard has
+# already set the page config, and a second call raises
+class _StripPageConfig(ast.NodeTransformer):
+    def visit_Expr(self, node):
+        call = node.value
+        if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                and call.func.attr == 'set_page_config'):
+            return ast.copy_location(ast.Pass(), node)
+        return node
+
+# Read a module, strip its st.set_page_config call and compile it.
+# Kept in a process-wide cache keyed on the file's mtime, so clear_memory()
+# does not drop it and edits to the module still invalidate it.
+@functools.lru_cache(maxsize=64)
+def _get_bytecode(module_path, mtime):
+    # Read the module content
+    with open(module_path, 'r') as file:
+        source_code = file.read()
+    
+    # Most modules can be compiled untouched
+    if "set_page_config" not in source_code:
+        return compile(source_code, module_path, 'exec', dont_inherit=True)
+    
+    # Strip the call from the syntax tree, so comments, strings and nested
+    # parentheses in its arguments cannot confuse the match
+    tree = _StripPageConfig().visit(ast.parse(source_code, module_path))
+    
+    return compile(tree, module_path, 'exec', dont_inherit=True)
+
 # Function to safely import module without set_page_config issues
 def import_module_safely(module_path, module_name):
     """Import a module from file path while handling set_page_config"""
     try:
         # Clear memory before importing new module
-        clear_memory()
-        
-        # Read the module content
-        with open(module_path, 'r') as file:
-            source_code = file.read()
-        
-        # Modify the source code to remove st.set_page_config call
-        modified_code = []
-        skip_line = False
-        inside_config = False
-        
-        for line in source_code.split('\n'):
-            if "st.set_page_config" in line:
-                skip_line = True
-                inside_config = True
-                continue
-            
-            if inside_config:
-                if ")" in line:
-                    inside_config = False
-                    skip_line = False
-                    continue
-            
-            if not skip_line:
-                modified_code.append(line)
+        clear_memory(clear_caches=False)
+        
+        code = _get_bytecode(module_path, os.path.getmtime(module_path))
         
         # Create a new module
         module = types.ModuleType(module_name)
@@ -713,11 +741,16 @@ def import_module_safely(module_path, module_name):
         # Set the module's __file__ attribute
         module.__file__ = module_path
         
+        # Let the module import helpers that live next to it
+        module_dir = os.path.dirname(module_path)
+        if module_dir not in sys.path:
+            sys.path.append(module_dir)
+        
         # Add the module to sys.modules
         sys.modules[module_name] = module
         
-        # Execute the modified code in the module's namespace
-        exec('\n'.join(modified_code), module.__dict__)
+        # Execute the compiled code in the module's namespace
+        exec(code, module.__dict__)
         
         return module
 
@@ -725,6 +758,15 @@ def import_module_safely(module_path, module_name):
         st.error(f"Error loading module: {str(e)}")
         return None
 
+# Filesystem checks, cached briefly so a burst of reruns does not hit the disk
+@st.cache_data(ttl=5)
+def _exists(path):
+    return os.path.exists(path)
+
+@st.cache_data(ttl=5)
+def _list_py_files(directory):
+    return [f for f in os.listdir(directory) if f.endswith('.py')]
+
 # Function to get sub-modules for a main module
 def get_sub_modules(main_module_name, base_dir):
     """Get list of sub-modules for a main module"""
@@ -734,19 +776,15 @@ def get_sub_modules(main_module_name, base_dir):
     # Look for a folder with the same name as the main module
     sub_module_dir = os.path.join(base_dir, main_name)
 
-    if not os.path.exists(sub_module_dir):
+    if not _exists(sub_module_dir):
         return []
 
-    # Get all .py files in the sub-module directory
-    sub_modules = []
-    for file in os.listdir(sub_module_dir):
-        if file.endswith('.py') and file != '__init__.py':
-            sub_modules.append(file)
+    # Get all .py files in the sub-module directory, skipping private helpers
+    # and __init__.py
+    return [file for file in _list_py_files(sub_module_dir) if not file.startswith('_')]
 
-    return sub_modules
-
-# Function to create a responsive card for each module
-def create_module_card(name, info, base_dir, is_sub_module=False):
+# Build the display title and card HTML for a module
+def _render_card(name, info, is_sub_module=False):
     module_name = name.replace('.py', '').replace('_', ' ').title()
 
     card_class = "sub-module-card" if is_sub_module else "module-card"
@@ -758,6 +796,37 @@ def create_module_card(name, info, base_dir, is_sub_module=False):
         <p>{info['desc']}</p>
     </div>
     """
+    return module_name, card_html
+
+# Define the main modules with their descriptions and icons
+MODULES = {
+    "Data_assembly_and_management.py": {
+        "icon": "🗂️", 
+        "desc": "Assemble datasets and manage data preprocessing workflows"
+    },
+    "Epidemiological_stratification.py": {
+        "icon": "📊", 
+        "desc": "Analyze epidemiological data and identify patterns"
+    },
+    "Review_of_past_interventions.py": {
+        "icon": "📈", 
+        "desc": "Evaluate the effectiveness of previous health interventions"
+    },
+    "Intervention_targeting.py": {
+        "icon": "🎯", 
+        "desc": "Plan and optimize new health intervention strategies"
+    }
+}
+
+# Main module cards never change, so render them once at import
+_MODULE_CARDS = {name: _render_card(name, info) for name, info in MODULES.items()}
+
+# Function to create a responsive card for each module
+def create_module_card(name, info, base_dir, is_sub_module=False):
+    if is_sub_module:
+        module_name, card_html = _render_card(name, info, is_sub_module=True)
+    else:
+        module_name, card_html = _MODULE_CARDS[name]
     
     st.markdown(card_html, unsafe_allow_html=True)
 
@@ -769,7 +838,7 @@ def create_module_card(name, info, base_dir, is_sub_module=False):
     else:
         module_file_path = os.path.join(base_dir, name)
 
-    file_exists = os.path.exists(module_file_path)
+    file_exists = _exists(module_file_path)
 
     if not file_exists:
         st.warning(f"Module file not found: {module_file_path}")
@@ -823,14 +892,14 @@ def run_module(module_path, module_name):
                 st.info(f"Module {module_name} has been loaded successfully.")
                 
             # Clear memory after module execution
-            clear_memory()
+            clear_memory(clear_caches=False)
         else:
             st.error(f"Failed to load module: {module_name}")
     except Exception as e:
         st.error(f"Error running module: {str(e)}")
         st.write(f"Details: {type(e).__name__}: {str(e)}")
         # Clear memory even on error
-        clear_memory()
+        clear_memory(clear_caches=False)
 
 # Main function to run the dashboard
 def main():
@@ -847,7 +916,7 @@ def main():
     create_breadcrumb()
 
     # Get the main directory path
-    base_dir = os.path.abspath(os.path.dirname(__file__))
+    base_dir = BASE_DIR
 
     # If a sub-module is selected, run it
     if st.session_state.current_sub_module and st.session_state.current_module:
@@ -940,28 +1009,8 @@ def main():
     # Show the main dashboard with the modules
     st.markdown("<h2>Select a Data Analysis Module</h2>", unsafe_allow_html=True)
 
-    # Define the main modules with their descriptions and icons
-    modules = {
-        "Data_assembly_and_management.py": {
-            "icon": "🗂️", 
-            "desc": "Assemble datasets and manage data preprocessing workflows"
-        },
-        "Epidemiological_stratification.py": {
-            "icon": "📊", 
-            "desc": "Analyze epidemiological data and identify patterns"
-        },
-        "Review_of_past_interventions.py": {
-            "icon": "📈", 
-            "desc": "Evaluate the effectiveness of previous health interventions"
-        },
-        "Intervention_targeting.py": {
-            "icon": "🎯", 
-            "desc": "Plan and optimize new health intervention strategies"
-        }
-    }
-
     # Create responsive layout for modules
-    module_list = list(modules.items())
+    module_list = list(MODULES.items())
     
     # Determine layout based on number of modules
     if len(module_list) <= 2:
@@ -993,14 +1042,7 @@ def main():
                     create_module_card(name, info, base_dir)
     
     # Create responsive footer
-    footer_html = """
-    <div class="footer">
-        <p>© 2025 Data Management and Analysis Tool | Version 1.0</p>
-        <p>Last updated: May 21, 2025</p>
-        <p>Developer: MS Kanu</p>
-    </div>
-    """
-    st.markdown(footer_html, unsafe_allow_html=True)
+    st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
     
     # Close main container
     st.markdown('</div>', unsafe_allow_html=True)
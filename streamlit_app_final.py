@@ -35,12 +35,17 @@ COLORS = {
 }
 
 # Memory cleanup function
-def clear_memory():
-    """Clear memory by removing cached data and running garbage collection"""
+def clear_memory(clear_caches=True):
+    """Clear memory by removing cached data and running garbage collection.
+    
+    Routine cleanups pass clear_caches=False so the app-wide Streamlit
+    caches survive; only an explicit or emergency clear drops them.
+    """
     try:
         # Clear Streamlit cache
-        st.cache_data.clear()
-        st.cache_resource.clear()
+        if clear_caches:
+            st.cache_data.clear()
+            st.cache_resource.clear()
         
         # Clear pandas cache if any
         if hasattr(pd, '_cache'):
@@ -118,7 +123,7 @@ def cleanup_button(label, key=None, **kwargs):
     """Custom button that automatically cleans memory when clicked"""
     button_clicked = st.button(label, key=key, **kwargs)
     if button_clicked:
-        clear_memory()
+        clear_memory(clear_caches=False)
     return button_clicked
 
 # Function to encode image to base64
@@ -542,7 +547,7 @@ def import_module_safely(module_path, module_name):
     """Import a module from file path while handling set_page_config"""
     try:
         # Clear memory before importing new module
-        clear_memory()
+        clear_memory(clear_caches=False)
         
         # Read the module content
         with open(module_path, 'r') as file:
@@ -574,6 +579,11 @@ def import_module_safely(module_path, module_name):
         # Set the module's __file__ attribute
         module.__file__ = module_path
         
+        # Let the module import helpers that live next to it
+        module_dir = os.path.dirname(module_path)
+        if module_dir not in sys.path:
+            sys.path.append(module_dir)
+        
         # Add the module to sys.modules
         sys.modules[module_name] = module
         
@@ -598,10 +608,11 @@ def get_sub_modules(main_module_name, base_dir):
     if not os.path.exists(sub_module_dir):
         return []
 
-    # Get all .py files in the sub-module directory
+    # Get all .py files in the sub-module directory, skipping private helpers
+    # and __init__.py
     sub_modules = []
     for file in os.listdir(sub_module_dir):
-        if file.endswith('.py') and file != '__init__.py':
+        if file.endswith('.py') and not file.startswith('_'):
             sub_modules.append(file)
 
     return sub_modules
@@ -685,14 +696,14 @@ def run_module(module_path, module_name):
                 st.info(f"Module {module_name} has been loaded successfully.")
                 
             # Clear memory after module execution
-            clear_memory()
+            clear_memory(clear_caches=False)
         else:
             st.error(f"Failed to load module: {module_name}")
     except Exception as e:
         st.error(f"Error running module: {str(e)}")
         st.write(f"Details: {type(e).__name__}: {str(e)}")
         # Clear memory even on error
-        clear_memory()
+        clear_memory(clear_caches=False)
 
 # Main function to run the dashboard
 def main():